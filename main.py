@@ -1,5 +1,6 @@
 import os
-import networkx as nx
+import sys
+import graphlib
 from structures.DASK_ParseTree import DASK_ParseTree
 from structures.SortedMap import SortedMap
 from structures.HashTable import HashTable, Dask
@@ -42,151 +43,248 @@ class Application:
     # We always create a parse tree object and hash table to store variables
     self.parser = DASK_ParseTree()
     self.hash_table = HashTable(100)
-    self.topological_graph = nx.DiGraph()
+    # dependency graph, deps maps a key to the vars it relies on and rdeps is the reverse
+    self.deps = {}
+    self.rdeps = {}
+    # variables whose value is stale
+    self.dirty = set()
+    # direct references to the stored Dask objects so hot loops skip the hash table probes
+    self.resolved = {}
+    # since we want to output sorted alphabetically we can use a sorted map
+    self.display_map = SortedMap(sorting_function=lambda x: x.lower())
 
   def add_dask_expresssion(self, key, exp):
-      tokens = self.parser.tokenizer(exp)
+      dask_obj = self.store_dask_expression(key, self.parser.tokenizer(exp))
+      if dask_obj is None:
+        return False
 
-      # Parse tree build and evaluate
-      self.hash_table[key] = Dask(expression=tokens, value=None)
-
-      # Adding to topological graph
-      # key relies on t
-      added_edges = [self.topological_graph.add_edge(t, key) for t in tokens if t.isalpha()]  
       # independent
-      if len(added_edges) == 0:
-        dask_obj = self.hash_table[key]
-        dask_obj.independent = True
-
+      if dask_obj.independent:
         # this becomes an expression that we can immediately evaluate
-        tree = self.parser.buildParseTree(dask_obj.expression)
-        value = self.parser.evaluate(tree, self.hash_table)
-        dask_obj.value = value
-
-        # update
-        self.hash_table[key] = dask_obj
-      return
-
-  def show_dask_expressions(self, sorting_key=lambda x: x.lower(), output=True):
-      # since we want to output sorted alphabetically we can use a sorted map
-      sorted_map = SortedMap(sorting_function=sorting_key)
-
-      if output:
-        print('CURRENT EXPRESSION:')
-        print('***************************************')
-
-      # print the independent ones first
-      for var, dask_obj in self.hash_table.items():
-        if dask_obj.independent:
-          sorted_map[var] = dask_obj
-
-      # iteratively calcuate
-      sorted_graph = list(nx.topological_sort(self.topological_graph))
-      for var in sorted_graph:
-        dask_obj = self.hash_table[var]
+        dask_obj.value = self.parser.evaluate_postfix(self.get_postfix(dask_obj), self.hash_table)
+        self.dirty.discard(key)
+      return True
+
+  def store_dask_expression(self, key, tokens):
+      # stores the tokenized expression and its edges, evaluation is left to evaluate_dirty
+      # returns None without storing anything if the expression would create a cycle
+      key = sys.intern(key)
+      # key relies on every var in its expression
+      dependencies = set(filter(str.isalpha, tokens))
+
+      cycle = self.find_cycle(key, dependencies)
+      if cycle is not None:
+        print(f'Circular dependency {" -> ".join(cycle)}! {key} was not added.')
+        return None
+
+      dask_obj = Dask(expression=tokens, value=None)
+      self.hash_table[key] = dask_obj
+      self.resolved[key] = dask_obj
+      self.display_map[key] = dask_obj
+
+      # Adding to dependency graph
+      self.set_dependencies(key, dependencies)
+      dask_obj.independent = not dependencies
+
+      self.mark_dirty(key)
+      return dask_obj
+
+  def remove_dask_expression(self, key):
+      # dependents now reference a missing var
+      self.mark_dirty(key)
+      self.hash_table.pop(key)
+      self.resolved.pop(key, None)
+      del self.display_map[key]
+      self.remove_dependencies(key)
+
+  def set_dependencies(self, key, dependencies):
+      # drop the edges of the old expression before adding the new ones
+      # dependencies is a set owned by the graph from here on
+      self.remove_dependencies(key)
+      self.deps[key] = dependencies
+      for t in dependencies:
+        self.rdeps.setdefault(t, set()).add(key)
+
+  def remove_dependencies(self, key):
+      # vars relying on key keep their edge so they are re-linked if key comes back
+      for t in self.deps.pop(key, ()):
+        self.rdeps[t].discard(key)
+
+  def find_cycle(self, key, dependencies):
+      # any new cycle passes through key, so only key and the vars relying on it matter
+      if not dependencies:
+        return None
+
+      affected = self.get_descendants(key)
+      graph = {var: self.deps.get(var, set()) & affected for var in affected}
+      graph[key] = dependencies & affected
+
+      try:
+        graphlib.TopologicalSorter(graph).prepare()
+      except graphlib.CycleError as e:
+        # the cycle is reported as a list of nodes starting and ending on the same node
+        return e.args[1]
+      return None
+
+  def get_descendants(self, key):
+      # key and everything that relies on it, directly or not
+      descendants = {key}
+      pending = [key]
+      while pending:
+        for var in self.rdeps.get(pending.pop(), ()):
+          if var not in descendants:
+            descendants.add(var)
+            pending.append(var)
+      return descendants
+
+  def mark_dirty(self, key):
+      # key and everything that relies on it needs re-evaluation
+      self.dirty.update(self.get_descendants(key))
+
+  def evaluate_dirty(self):
+      # only order the dirty subgraph, clean vars already hold their values
+      # a var is ready once none of its dirty dependencies are left, cycles are rejected on insert
+      waiting = {}
+      ready = []
+      for var in self.dirty:
+        count = len(self.deps.get(var, set()) & self.dirty)
+        if count:
+          waiting[var] = count
+        else:
+          ready.append(var)
+
+      while ready:
+        var = ready.pop()
+        # its dependents get one step closer to ready
+        for dependent in self.rdeps.get(var, ()):
+          if dependent in waiting:
+            waiting[dependent] -= 1
+            if not waiting[dependent]:
+              del waiting[dependent]
+              ready.append(dependent)
+
+        dask_obj = self.resolved.get(var)
         if dask_obj == None:
           # skip the ones that dont exist
           continue
 
-        if dask_obj.independent:
-          # skip independent ones
-          continue
-
         # calcuate value
-        tree = self.parser.buildParseTree(dask_obj.expression)
-        value = self.parser.evaluate(tree, self.hash_table)
+        # Update the dask thingy, it is the same object stored in the hash table
+        dask_obj.value = self.parser.evaluate_postfix(self.get_postfix(dask_obj), self.hash_table)
+
+      self.dirty.clear()
+
+  def get_parse_tree(self, dask_obj):
+      # trees only depend on the tokens so we build once and reuse until the expression changes
+      # nodes are hash consed so identical expressions still share one tree
+      if dask_obj.tree is None:
+        dask_obj.tree = self.parser.buildParseTree(dask_obj.expression)
+      return dask_obj.tree
 
-        # Update the dask thingy
-        dask_obj.value = value
-        self.hash_table[var] = dask_obj
+  def get_postfix(self, dask_obj):
+      # flat post order form of the tree, evaluated with a loop instead of recursion
+      if dask_obj.postfix is None:
+        dask_obj.postfix = self.parser.to_postfix(self.get_parse_tree(dask_obj))
+      return dask_obj.postfix
 
-        # add to sorted map
-        sorted_map[var] = dask_obj
+  def show_dask_expressions(self, output=True):
+      if output:
+        print('CURRENT EXPRESSION:')
+        print('***************************************')
 
-      # output all
+      # bring values up to date, only what changed gets recomputed
+      self.evaluate_dirty()
+
+      # the display map is kept sorted as expressions are added and removed
       if output:
-        for var, dask_obj in sorted_map.items():
+        for var, dask_obj in self.display_map.items():
           print(f'{var}={dask_obj}')
-      return sorted_map
+      return self.display_map
 
       
-  def run(self):
-    #################################
-    # Main Loop Recursive
-    #################################
-    choice = input("Enter choice: ")
-
-    if choice == '10':
-      return
-    # Expression Storing/Modify
-    if choice == '1':
+  def add_expression_menu(self):
+      # Expression Storing/Modify
       print("Enter the DASK expression you want to add/modify:")
       print("For example: a=(1+2)\n")
       key, exp = dask_input("Enter DASK expression: ")
       self.add_dask_expresssion(key, exp)
 
-    # evaluuation
-    elif choice == '2':
+  def display_menu(self):
+      # evaluuation
       self.show_dask_expressions()
-    # evaluate single expression from hash
-    elif choice == '3':
+
+  def evaluate_variable_menu(self):
+      # evaluate single expression from hash
       print("Enter the variable you want to evaluate:")
-      var = input().strip()
+      var = sys.intern(input().strip())
       dask_obj = self.hash_table[var]
       # validate proper variable
       while dask_obj == None:
         print(f'Variable {var} does not exist!')
         print('Please enter another variable: \n')
-        var = input().strip()
+        var = sys.intern(input().strip())
         dask_obj = self.hash_table[var]
 
-      tree = self.parser.buildParseTree(dask_obj.expression)
-      value = self.parser.evaluate(tree, self.hash_table)
+      # brings its value up to date along with the variables it relies on
+      self.evaluate_dirty()
+      tree = self.get_parse_tree(dask_obj)
+      value = dask_obj.value
 
       print('\nExpression Tree (Inorder):')
       tree.print_tree_inorder()
       print(f'Value of variable "{var}" is {value}')
 
-    # read from file and add dask to table
-    elif choice == '4':
+  def read_file_menu(self):
+      # read from file and add dask to table
       filename = input_file_path("Please enter input file: ")
 
       with open(filename, 'r') as f:
         lines = f.readlines()
 
         for line in lines:
-          key , exp = line.strip().split('=', 1)
+          key, _, exp = line.strip().partition('=')
+
+          # tokenize once, the same tokens are verified and stored
+          tokens = self.parser.tokenizer(exp)
 
           # skip invalid expressions
-          if not self.parser.verify_expression(exp):
+          if not self.parser.verify_tokens(tokens):
             print(f'Invalid DASK for {key} = {exp}. Skipping...')
             continue
 
-          self.add_dask_expresssion(key, exp)
+          # evaluation is deferred so every expression is computed once below
+          self.store_dask_expression(key, tokens)
       f.close()
       
-      # print current expressions
+      # print current expressions, this evaluates everything loaded in one topological pass
       self.show_dask_expressions()
 
-    # sort expressions based on result values
-    elif choice == '5':
+  def sort_expressions_menu(self):
+      # sort expressions based on result values
       filename = input("Please enter output file: ")
-      sorted_map = self.show_dask_expressions(sorting_key=lambda x: -self.hash_table[x].value if self.hash_table[x].value != None else float('inf'), output=False)
-      with open(filename, 'w') as f:
-        prev = float('-inf')
-        for var, dask_obj in sorted_map.items():
-          if dask_obj.value != prev:
-            f.write(f'\n*** Expressions with value => {dask_obj.value}\n')
-            prev = dask_obj.value
-
-          exp_str = ''.join(dask_obj.expression)
-          f.write(f'{var}={exp_str}\n')
-      f.close()
+      self.evaluate_dirty()
+
+      # compute each sort key once, descending value with None last and ties alphabetical
+      ranked = [(-dask_obj.value if dask_obj.value != None else float('inf'), var.lower(), var, dask_obj)
+                for var, dask_obj in self.resolved.items()]
+      ranked.sort()
+
+      # build all lines first then hand them to the file in one call
+      lines = []
+      prev = float('-inf')
+      for _, _, var, dask_obj in ranked:
+        if dask_obj.value != prev:
+          lines.append(f'\n*** Expressions with value => {dask_obj.value}\n')
+          prev = dask_obj.value
+        lines.append(f'{var}={dask_obj.text}\n')
+
+      with open(filename, 'w', buffering=1 << 20) as f:
+        f.writelines(lines)
 
       print('>>>Sorting of DASK expressions completed!')
 
-    # Jovan - DASK Report
-    elif choice == '6':
+  def report_menu(self):
+      # Jovan - DASK Report
       output_path = input("Please enter output HTML file path: ")
 
       while output_path.strip() == '' or not output_path.lower().endswith('.html'):
@@ -194,7 +292,7 @@ class Application:
         output_path = input("Please enter output HTML file path: ")
               
       # get data
-      data = get_dask_data(self.topological_graph, self.show_dask_expressions(output=False), self.parser.buildParseTree)
+      data = get_dask_data(self.deps, self.show_dask_expressions(output=False), self.get_parse_tree)
 
       # build html
       build_html(data, output_path)
@@ -207,27 +305,24 @@ class Application:
       if open_query.lower() == 'y':
         os.startfile(output_path)
 
-    # Jovan - Temp DASK Variable Visualizer
-    elif choice == '7':
+  def visualizer_menu(self):
+      # Jovan - Temp DASK Variable Visualizer
       clear()
       self.show_dask_expressions()
       print('\nPlease enter expressions to visualize DASK Variables (q to quit):')
-      expression = 0
       pending_keys = []
+      key, expression = dask_input("Enter DASK expression: ", allow_quit=True)
 
       while expression != 'q':
-        key , expression = dask_input("Enter DASK expression: ", allow_quit=True)
-        
-        # add dask 'temp'
-        pending_keys.append(key)
-        self.add_dask_expresssion(key, expression)
+        # add dask 'temp', rejected ones are not pending
+        if self.add_dask_expresssion(key, expression):
+          pending_keys.append(key)
         clear()
 
-
-        # custom print
-        sorted_map = self.show_dask_expressions(output=False)
-        for var, dask_obj in sorted_map.items():
-          if var in pending_keys:
+        # custom print, only the vars affected by this key get re-evaluated
+        pending = set(pending_keys)
+        for var, dask_obj in self.show_dask_expressions(output=False).items():
+          if var in pending:
             print(f'***{var}={dask_obj}***')
           else:
             print(f'{var}={dask_obj}')
@@ -241,38 +336,62 @@ class Application:
         print('\nThe following expressions were not added:')
         print('***********************************************')
         for pk in pending_keys:
-          dask_obj = self.hash_table[pk]
-          print(f'{pk}={dask_obj}')
+          print(f'{pk}={self.resolved.get(pk)}')
 
         add_expressions = yes_no_input('Do you want to add these expressions? (y/n): ')
 
         if add_expressions.lower() == 'n':
           # remove since theyre alr stored
           for pk in pending_keys:
-            del self.hash_table[pk]
-
-            # handle graph edges 
-            if pk in self.topological_graph:
-              self.topological_graph.remove_node(pk)
+            self.remove_dask_expression(pk)
       clear()
 
-    # Dependency Analyzer & Cycle Detection (unified feature)
-    elif choice == '8':
-      run_dependency_analyzer(self.hash_table)
+  def dependency_analyzer_menu(self):
+      # Dependency Analyzer & Cycle Detection (unified feature)
+      # the graph kept up to date on every edit spares the analyzer re-tokenizing everything
+      run_dependency_analyzer(self.hash_table, self.deps)
 
-    # Expression Optimizer / Simplifier
-    elif choice == '9':
+  def optimizer_menu(self):
+      # Expression Optimizer / Simplifier
+      version = self.hash_table.version
       run_expression_optimizer(self.hash_table, self.parser)
-      
-    # invalid
-    else:
+
+      if self.hash_table.version != version:
+        # expressions may have been rewritten in place and simplifying can drop variables
+        for var, dask_obj in self.hash_table.items():
+          dependencies = set(filter(str.isalpha, dask_obj.expression))
+          self.set_dependencies(var, dependencies)
+          dask_obj.independent = not dependencies
+          self.dirty.add(var)
+
+  def invalid_choice(self):
+      # invalid
       print('That is not a valid choice. Please try again.')
 
-    # re-input
-    input('Press enter key, to continue... ')
-    print(self.menu_msg)
-    self.run()
-    
+  def run(self):
+    #################################
+    # Main Loop
+    #################################
+    # choice -> handler, looked up once per input instead of walking an if/elif chain
+    handlers = {
+      '1': self.add_expression_menu,
+      '2': self.display_menu,
+      '3': self.evaluate_variable_menu,
+      '4': self.read_file_menu,
+      '5': self.sort_expressions_menu,
+      '6': self.report_menu,
+      '7': self.visualizer_menu,
+      '8': self.dependency_analyzer_menu,
+      '9': self.optimizer_menu,
+    }
+
+    while (choice := input("Enter choice: ")) != '10':
+      handlers.get(choice, self.invalid_choice)()
+
+      # re-input
+      input('Press enter key, to continue... ')
+      print(self.menu_msg)
+
 # psvm
 
 if __name__ == '__main__':
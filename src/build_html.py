@@ -1,8 +1,19 @@
 import json
+from functools import lru_cache
+
+@lru_cache(maxsize=None)
+def load_template(path='templates/template.html'):
+  # split once around the sentinel, it sits inside the braces of the mock object
+  with open(path, 'r') as f:
+    head, tail = f.read().split('/*<mock_data>*/', 1)
+
+  # drop those braces since json.dump writes its own
+  return head.rstrip()[:-1], tail.lstrip()[1:]
+
 def build_html(data, output_path):
-  with open('templates/template.html' , 'r') as f:
-    template = f.read()
-    template = template.replace('/*<mock_data>*/', json.dumps(data)[1:-1]) # indexing removes start end {}
+  head, tail = load_template()
 
-    with open(output_path, 'w') as out_file:
-      out_file.write(template)
\ No newline at end of file
+  with open(output_path, 'w') as out_file:
+    out_file.write(head)
+    json.dump(data, out_file)
+    out_file.write(tail)
@@ -1,173 +1,264 @@
+import re
+import sys
+from collections import deque
+from functools import lru_cache
+from itertools import groupby
+
+
+# runs of letters, the file analyzer's variable names
+_NAME_RE = re.compile(r'[^\W\d_]+')
+
+
 class DependencyAnalyzer:
     """Unified dependency analyzer with forward/reverse graphs and cycle detection."""
     
-    # DFS vertex states for cycle detection
-    UNVISITED = 0
-    VISITING = 1
-    VISITED = 2
-    
-    def __init__(self, hash_table=None, expressions=None):
+    def __init__(self, hash_table=None, expressions=None, dependencies=None):
         """Initialize with either hash_table or expressions dict."""
         self._hash_table = hash_table
         self._expressions = expressions  # dict of var -> expression string
+        self._dependencies = dependencies  # var -> vars it relies on, already kept by the caller
         self._defined_variables = set()
         self._forward_graph = {}
-        self._reverse_graph = {}
-        self._undefined_vars = None
+        self._reverse_graph = None  # built on first reverse query
+        # transitive closures per variable, the graphs never change after building
+        self._fwd_closure_cache = {}
+        self._rev_closure_cache = {}
+        self._dependents_cache = {}  # var -> (dependents, levels)
+        self._expr_string_cache = {}
+        self._undefined_vars = set()
+        self._total_edges = 0
+        self._sorted_defined = None
         self._cycles = None
+        self._cyclic_components = None
         self._vars_in_cycles = None
         self._build_graphs()
     
     def _build_graphs(self):
-        """Build both forward and reverse dependency graphs."""
-        # Build forward graph from hash_table or expressions dict
-        if self._hash_table is not None:
-            for variable, dask_obj in self._hash_table.items():
-                if dask_obj is not None:
-                    dependencies = self._extract_dependencies(dask_obj.expression)
-                    dependencies.discard(variable)
-                    
-                    self._defined_variables.add(variable)
-                    self._forward_graph[variable] = dependencies
-                    
-                    for dep in dependencies:
-                        if dep not in self._forward_graph:
-                            self._forward_graph[dep] = set()
+        """Build the forward dependency graph."""
+        # Build forward graph from the caller's dependencies, hash_table or expressions dict
+        if self._dependencies is not None:
+            # kept up to date by the caller, so nothing needs tokenizing again
+            dependencies = self._dependencies.items()
+        elif self._hash_table is not None:
+            dependencies = ((variable, self._extract_dependencies(tuple(dask_obj.expression)))
+                            for variable, dask_obj in self._hash_table.items() if dask_obj is not None)
         elif self._expressions is not None:
-            for variable, expr_tokens in self._expressions.items():
-                dependencies = self._extract_dependencies(expr_tokens)
-                dependencies.discard(variable)
-                
-                self._defined_variables.add(variable)
-                self._forward_graph[variable] = dependencies
-                
-                for dep in dependencies:
-                    if dep not in self._forward_graph:
-                        self._forward_graph[dep] = set()
+            dependencies = ((variable, self._extract_dependencies(tuple(tokens)))
+                            for variable, tokens in self._expressions.items())
+        else:
+            dependencies = ()
         
-        # Build reverse graph (transpose)
-        for var in self._forward_graph:
-            self._reverse_graph[var] = set()
+        # read only from here on so the getters can hand them out without copying
+        self._forward_graph = {variable: frozenset(deps) - {variable} for variable, deps in dependencies}
+        self._defined_variables = set(self._forward_graph)
         
+        # the graph never changes so the edge count is taken once
+        self._total_edges = sum(map(len, self._forward_graph.values()))
+        
+        # referenced but undefined vars are nodes too, with no edges of their own
+        referenced = set().union(*self._forward_graph.values())
+        self._undefined_vars = referenced - self._defined_variables
+        self._forward_graph.update(dict.fromkeys(self._undefined_vars, frozenset()))
+    
+    def _get_reverse_graph(self):
+        """Build the reverse graph (transpose) on first use."""
+        if self._reverse_graph is not None:
+            return self._reverse_graph
+        
+        # every referenced var is already a key of the forward graph
+        reverse_graph = {var: set() for var in self._forward_graph}
         for var, deps in self._forward_graph.items():
             for dep in deps:
-                if dep not in self._reverse_graph:
-                    self._reverse_graph[dep] = set()
-                self._reverse_graph[dep].add(var)
+                reverse_graph[dep].add(var)
+        
+        self._reverse_graph = {var: frozenset(deps) for var, deps in reverse_graph.items()}
+        return self._reverse_graph
     
     @staticmethod
+    @lru_cache(maxsize=4096)
     def _extract_dependencies(tokens):
-        """Extract variable dependencies from expression tokens."""
-        return {token for token in tokens if token.isalpha()}
+        """Extract variable dependencies from a tuple of expression tokens."""
+        # memoized across analyzer rebuilds, unchanged expressions are not rescanned
+        return frozenset(filter(str.isalpha, tokens))
     
     def get_dependencies(self, variable):
         """Get direct dependencies of a variable."""
-        return self._forward_graph.get(variable, set()).copy()
+        return self._forward_graph.get(variable, frozenset())
     
     def get_all_dependencies(self, variable):
-        """Get all dependencies using BFS (transitive closure)."""
+        """Get all dependencies (transitive closure), memoized per variable."""
         if variable not in self._forward_graph:
-            return set()
-        
-        visited = set()
-        queue = list(self._forward_graph.get(variable, set()))
+            return frozenset()
         
-        while queue:
-            current = queue.pop(0)
-            if current not in visited:
-                visited.add(current)
-                queue.extend(self._forward_graph.get(current, set()) - visited)
+        return self._transitive_closure(variable, self._forward_graph, self._fwd_closure_cache)
+    
+    def _transitive_closure(self, variable, graph, cache):
+        """Transitive closure of variable over graph, filling cache bottom up."""
+        # an SCC comes out only after every SCC it reaches, so its closure is the
+        # union of its neighbours' cached closures plus the SCC itself when it is a cycle
+        for members in self._strongly_connected(graph, [variable], cache):
+            closure = set(members) if len(members) > 1 else set()
+            for member in members:
+                for neighbor in graph.get(member, ()):
+                    if neighbor not in members:
+                        closure.add(neighbor)
+                        closure |= cache[neighbor]
+            
+            closure = frozenset(closure)
+            for member in members:
+                cache[member] = closure
         
-        return visited
+        return cache[variable]
+    
+    @staticmethod
+    def _strongly_connected(graph, starts, done=()):
+        """Yield the SCCs reachable from starts (iterative Tarjan), skipping nodes in done."""
+        index = {}
+        lowlink = {}
+        scc_stack = []
+        on_stack = set()
+        
+        for start in starts:
+            if start in index or start in done:
+                continue
+            
+            index[start] = lowlink[start] = len(index)
+            scc_stack.append(start)
+            on_stack.add(start)
+            work = [(start, iter(graph.get(start, ())))]
+            
+            while work:
+                node, neighbors = work[-1]
+                
+                for neighbor in neighbors:
+                    if neighbor in done:
+                        continue
+                    if neighbor not in index:
+                        index[neighbor] = lowlink[neighbor] = len(index)
+                        scc_stack.append(neighbor)
+                        on_stack.add(neighbor)
+                        work.append((neighbor, iter(graph.get(neighbor, ()))))
+                        break
+                    if neighbor in on_stack:
+                        lowlink[node] = min(lowlink[node], index[neighbor])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+                    
+                    if lowlink[node] == index[node]:
+                        members = set()
+                        while True:
+                            member = scc_stack.pop()
+                            on_stack.discard(member)
+                            members.add(member)
+                            if member == node:
+                                break
+                        yield members
     
     def get_dependents(self, variable):
         """Get direct dependents of a variable."""
-        return self._reverse_graph.get(variable, set()).copy()
+        return self._get_reverse_graph().get(variable, frozenset())
     
     def get_all_dependents(self, variable):
-        """Get all dependents with distances using BFS."""
-        if variable not in self._reverse_graph:
+        """Get all dependents with distances using level by level BFS."""
+        if variable in self._dependents_cache:
+            return self._dependents_cache[variable]
+        
+        reverse_graph = self._get_reverse_graph()
+        if variable not in reverse_graph:
             return set(), {}
         
         visited = set()
         levels = {}
-        queue = [(variable, 0)]
+        frontier = {variable}
+        level = 0
         
-        while queue:
-            current, level = queue.pop(0)
-            
-            for dependent in self._reverse_graph.get(current, set()):
-                if dependent not in visited:
-                    visited.add(dependent)
-                    levels[dependent] = level + 1
-                    queue.append((dependent, level + 1))
+        # one whole level at a time, so the visited checks are set differences
+        while frontier:
+            level += 1
+            frontier = set().union(*(reverse_graph[current] for current in frontier)) - visited
+            visited |= frontier
+            levels.update(dict.fromkeys(frontier, level))
         
+        self._dependents_cache[variable] = visited, levels
         return visited, levels
     
+    def get_affected_variables(self, variable):
+        """Get all dependents without distances, memoized per variable."""
+        reverse_graph = self._get_reverse_graph()
+        if variable not in reverse_graph:
+            return frozenset()
+        
+        return self._transitive_closure(variable, reverse_graph, self._rev_closure_cache)
+    
     def detect_cycles(self):
-        """Detect all cycles using DFS with vertex coloring."""
+        """Detect cycles as strongly connected components, one example path each."""
         if self._cycles is not None:
             return self._vars_in_cycles, self._cycles
         
-        state = {node: self.UNVISITED for node in self._forward_graph}
-        self._vars_in_cycles = set()
-        self._cycles = []
-        
-        def dfs(node, path):
-            state[node] = self.VISITING
-            
-            for neighbor in self._forward_graph.get(node, set()):
-                if neighbor not in state:
-                    continue
-                
-                if state[neighbor] == self.VISITING:
-                    cycle = self._reconstruct_cycle(path, neighbor)
-                    self._cycles.append(cycle)
-                    self._vars_in_cycles.update(cycle[:-1])
-                    
-                elif state[neighbor] == self.UNVISITED:
-                    dfs(neighbor, path + [neighbor])
-            
-            state[node] = self.VISITED
-        
-        for node in self._forward_graph:
-            if state[node] == self.UNVISITED:
-                dfs(node, [node])
-        
+        self._cycles = [self._find_cycle_path(members) for members in self._get_cyclic_components()]
         return self._vars_in_cycles, self._cycles
     
-    def _reconstruct_cycle(self, path, cycle_start):
-        """Reconstruct cycle path from DFS traversal."""
-        try:
-            start_idx = path.index(cycle_start)
-            return path[start_idx:] + [cycle_start]
-        except ValueError:
-            return [cycle_start, path[-1], cycle_start]
+    def _get_cyclic_components(self):
+        """SCCs with more than one variable, self references are dropped when building."""
+        if self._cyclic_components is None:
+            self._cyclic_components = [
+                members for members in self._strongly_connected(self._forward_graph, self._forward_graph)
+                if len(members) > 1
+            ]
+            self._vars_in_cycles = set().union(*self._cyclic_components)
+        return self._cyclic_components
+    
+    def _find_cycle_path(self, members):
+        """Shortest cycle through one member using BFS inside the component."""
+        start = min(members)
+        parents = {start: None}
+        queue = deque([start])
+        
+        while queue:
+            current = queue.popleft()
+            for neighbor in self._forward_graph.get(current, set()):
+                if neighbor == start:
+                    # walk the parents back to start
+                    path = [start]
+                    while current is not None:
+                        path.append(current)
+                        current = parents[current]
+                    path.reverse()
+                    return path
+                if neighbor in members and neighbor not in parents:
+                    parents[neighbor] = current
+                    queue.append(neighbor)
+        
+        return [start, start]
     
     def get_undefined_variables(self):
         """Find variables referenced but never defined."""
-        if self._undefined_vars is not None:
-            return self._undefined_vars
-        
-        all_referenced = set()
-        for deps in self._forward_graph.values():
-            all_referenced.update(deps)
-        
-        self._undefined_vars = all_referenced - self._defined_variables
+        # found while building the graph
         return self._undefined_vars
     
     def get_defined_variables(self):
         return self._defined_variables.copy()
     
+    def get_sorted_defined_variables(self):
+        """Defined variables in case-insensitive order, sorted once."""
+        if self._sorted_defined is None:
+            self._sorted_defined = sorted(self._defined_variables, key=str.lower)
+        return self._sorted_defined
+    
     def get_total_variables(self):
         return len(self._defined_variables)
     
     def get_total_edges(self):
-        return sum(len(deps) for deps in self._forward_graph.values())
+        return self._total_edges
     
     def has_cycles(self):
-        _, cycles = self.detect_cycles()
-        return len(cycles) > 0
+        if self._cyclic_components is not None:
+            return len(self._cyclic_components) > 0
+        # the SCCs are generated lazily so this stops at the first cycle found
+        return any(len(members) > 1 for members in self._strongly_connected(self._forward_graph, self._forward_graph))
     
     def has_undefined(self):
         return len(self.get_undefined_variables()) > 0
@@ -179,14 +270,21 @@ class DependencyAnalyzer:
         return variable in self._forward_graph
     
     def get_expression_string(self, variable):
+        exp_str = self._expr_string_cache.get(variable)
+        if exp_str is not None:
+            return exp_str
+        
+        exp_str = "?"
         if self._hash_table is not None:
             dask_obj = self._hash_table[variable]
             if dask_obj:
-                return ''.join(dask_obj.expression)
+                exp_str = dask_obj.text
         elif self._expressions is not None:
             if variable in self._expressions:
-                return ''.join(self._expressions[variable])
-        return "?"
+                exp_str = ''.join(self._expressions[variable])
+        
+        self._expr_string_cache[variable] = exp_str
+        return exp_str
 
 
 class DependencyAnalyzerUI:
@@ -206,12 +304,13 @@ class DependencyAnalyzerUI:
     +==============================================================+
     """
     
-    def __init__(self, hash_table):
+    def __init__(self, hash_table, dependencies=None):
         self._hash_table = hash_table
+        self._dependencies = dependencies
         self._analyzer = None
     
     def run(self):
-        self._analyzer = DependencyAnalyzer(self._hash_table)
+        self._analyzer = get_analyzer(self._hash_table, self._dependencies)
         self._print_header()
         
         while True:
@@ -254,23 +353,26 @@ class DependencyAnalyzerUI:
     def _show_all_dependencies(self):
         self._print_section("ALL VARIABLE DEPENDENCIES")
         
-        defined_vars = sorted(self._analyzer.get_defined_variables(), key=str.lower)
+        defined_vars = self._analyzer.get_sorted_defined_variables()
         
         if not defined_vars:
             print("    No variables defined.")
             return
         
+        # collect every line and write them out at once
+        lines = []
         for var in defined_vars:
             deps = self._analyzer.get_dependencies(var)
             exp_str = self._analyzer.get_expression_string(var)
             
             if deps:
                 deps_str = ", ".join(sorted(deps, key=str.lower))
-                print(f"    {var} = {exp_str}")
-                print(f"        --> depends on: {deps_str}")
+                lines.append(f"    {var} = {exp_str}\n")
+                lines.append(f"        --> depends on: {deps_str}\n")
             else:
-                print(f"    {var} = {exp_str}")
-                print(f"        --> (independent - no dependencies)")
+                lines.append(f"    {var} = {exp_str}\n")
+                lines.append(f"        --> (independent - no dependencies)\n")
+        sys.stdout.write(''.join(lines))
     
     def _show_undefined_variables(self):
         self._print_section("UNDEFINED VARIABLE CHECK")
@@ -283,13 +385,13 @@ class DependencyAnalyzerUI:
         
         print(f"    [WARNING] Found {len(undefined)} undefined variable(s):\n")
         
+        lines = []
         for var in sorted(undefined, key=str.lower):
-            referencing = []
-            for defined_var in self._analyzer.get_defined_variables():
-                if var in self._analyzer.get_dependencies(defined_var):
-                    referencing.append(defined_var)
+            # the reverse graph already holds everything that references var
+            referencing = sorted(self._analyzer.get_dependents(var), key=str.lower)
             
-            print(f"        - '{var}' is referenced by: {', '.join(referencing)}")
+            lines.append(f"        - '{var}' is referenced by: {', '.join(referencing)}\n")
+        sys.stdout.write(''.join(lines))
     
     def _query_forward_dependencies(self):
         self._print_section("FORWARD DEPENDENCY QUERY")
@@ -310,25 +412,31 @@ class DependencyAnalyzerUI:
         exp_str = self._analyzer.get_expression_string(var)
         print(f"\n    {var} = {exp_str}")
         
+        # every dependency is either defined or in this set, so one lookup gives the status
+        undefined = self._analyzer.get_undefined_variables()
+        
+        # collect every line and write them out at once
+        lines = []
         direct = self._analyzer.get_dependencies(var)
-        print(f"\n    Direct dependencies ({len(direct)}):")
+        lines.append(f"\n    Direct dependencies ({len(direct)}):\n")
         if direct:
             for dep in sorted(direct, key=str.lower):
-                status = "[DEFINED]" if self._analyzer.variable_exists(dep) else "[UNDEFINED]"
-                print(f"        - {dep} {status}")
+                status = "[UNDEFINED]" if dep in undefined else "[DEFINED]"
+                lines.append(f"        - {dep} {status}\n")
         else:
-            print("        (none - this is an independent variable)")
+            lines.append("        (none - this is an independent variable)\n")
         
         all_deps = self._analyzer.get_all_dependencies(var)
         indirect = all_deps - direct
         
         if indirect:
-            print(f"\n    Indirect dependencies ({len(indirect)}):")
+            lines.append(f"\n    Indirect dependencies ({len(indirect)}):\n")
             for dep in sorted(indirect, key=str.lower):
-                status = "[DEFINED]" if self._analyzer.variable_exists(dep) else "[UNDEFINED]"
-                print(f"        - {dep} {status}")
+                status = "[UNDEFINED]" if dep in undefined else "[DEFINED]"
+                lines.append(f"        - {dep} {status}\n")
         
-        print(f"\n    Total: {len(all_deps)} dependency(ies)")
+        lines.append(f"\n    Total: {len(all_deps)} dependency(ies)\n")
+        sys.stdout.write(''.join(lines))
     
     def _query_reverse_dependencies(self):
         self._print_section("REVERSE DEPENDENCY QUERY")
@@ -350,31 +458,35 @@ class DependencyAnalyzerUI:
         print(f"\n    Query: What depends on '{var}'?")
         print(f"    {var} = {exp_str}")
         
+        # collect every line and write them out at once
+        lines = []
         direct = self._analyzer.get_dependents(var)
-        print(f"\n    Direct dependents ({len(direct)}):")
+        lines.append(f"\n    Direct dependents ({len(direct)}):\n")
         if direct:
             for dep in sorted(direct, key=str.lower):
                 dep_exp = self._analyzer.get_expression_string(dep)
-                print(f"        - {dep} = {dep_exp}")
+                lines.append(f"        - {dep} = {dep_exp}\n")
         else:
-            print("        (none - this is a leaf variable)")
+            lines.append("        (none - this is a leaf variable)\n")
         
         all_deps, levels = self._analyzer.get_all_dependents(var)
         
-        if all_deps - direct:
-            max_level = max(levels.values()) if levels else 0
-            for lvl in range(2, max_level + 1):
-                vars_at_level = sorted([v for v, l in levels.items() if l == lvl], key=str.lower)
-                if vars_at_level:
-                    print(f"\n    Level {lvl} dependents ({len(vars_at_level)}):")
-                    for dep in vars_at_level:
-                        dep_exp = self._analyzer.get_expression_string(dep)
-                        print(f"        - {dep} = {dep_exp}")
-        
-        print(f"\n    Impact Summary:")
-        print(f"        If '{var}' changes, {len(all_deps)} variable(s) would need re-evaluation")
+        # one sort orders the levels and the names within each, level 1 is printed above
+        by_level = sorted(levels, key=lambda v: (levels[v], v.lower()))
+        for lvl, group in groupby(by_level, key=levels.get):
+            if lvl < 2:
+                continue
+            vars_at_level = list(group)
+            lines.append(f"\n    Level {lvl} dependents ({len(vars_at_level)}):\n")
+            for dep in vars_at_level:
+                dep_exp = self._analyzer.get_expression_string(dep)
+                lines.append(f"        - {dep} = {dep_exp}\n")
+        
+        lines.append(f"\n    Impact Summary:\n")
+        lines.append(f"        If '{var}' changes, {len(all_deps)} variable(s) would need re-evaluation\n")
         if all_deps:
-            print(f"        Affected: {', '.join(sorted(all_deps, key=str.lower))}")
+            lines.append(f"        Affected: {', '.join(sorted(all_deps, key=str.lower))}\n")
+        sys.stdout.write(''.join(lines))
     
     def _show_full_report(self):
         self._print_section("FULL DEPENDENCY ANALYSIS REPORT")
@@ -408,41 +520,43 @@ class DependencyAnalyzerUI:
         print(f"\n    DEPENDENCY OVERVIEW")
         print(f"    {'.' * 50}")
         
-        independent = [v for v in self._analyzer.get_defined_variables() 
-                       if not self._analyzer.get_dependencies(v)]
-        if independent:
-            print(f"    Independent (base) variables: {', '.join(sorted(independent, key=str.lower))}")
-        
-        leaves = [v for v in self._analyzer.get_defined_variables() 
-                  if not self._analyzer.get_dependents(v)]
-        if leaves:
-            print(f"    Leaf (output) variables:      {', '.join(sorted(leaves, key=str.lower))}")
-        
+        # one pass over the sorted list fills every group below, already in order
+        independent = []
+        leaves = []
         max_deps = 0
         most_deps = []
-        for var in self._analyzer.get_defined_variables():
+        max_dependents = 0
+        most_dependents = []
+        
+        for var in self._analyzer.get_sorted_defined_variables():
             deps = len(self._analyzer.get_dependencies(var))
+            if not deps:
+                independent.append(var)
+            if not self._analyzer.get_dependents(var):
+                leaves.append(var)
+            
             if deps > max_deps:
                 max_deps = deps
                 most_deps = [var]
             elif deps == max_deps and deps > 0:
                 most_deps.append(var)
-        
-        if most_deps and max_deps > 0:
-            print(f"    Most dependencies ({max_deps}):        {', '.join(sorted(most_deps, key=str.lower))}")
-        
-        max_dependents = 0
-        most_dependents = []
-        for var in self._analyzer.get_defined_variables():
-            deps, _ = self._analyzer.get_all_dependents(var)
-            if len(deps) > max_dependents:
-                max_dependents = len(deps)
+            
+            # transitive, served from the analyzer's closure cache
+            affected = len(self._analyzer.get_affected_variables(var))
+            if affected > max_dependents:
+                max_dependents = affected
                 most_dependents = [var]
-            elif len(deps) == max_dependents and len(deps) > 0:
+            elif affected == max_dependents and affected > 0:
                 most_dependents.append(var)
         
+        if independent:
+            print(f"    Independent (base) variables: {', '.join(independent)}")
+        if leaves:
+            print(f"    Leaf (output) variables:      {', '.join(leaves)}")
+        if most_deps and max_deps > 0:
+            print(f"    Most dependencies ({max_deps}):        {', '.join(most_deps)}")
         if most_dependents and max_dependents > 0:
-            print(f"    Most impact ({max_dependents} affected):     {', '.join(sorted(most_dependents, key=str.lower))}")
+            print(f"    Most impact ({max_dependents} affected):     {', '.join(most_dependents)}")
     
     def _load_and_analyze_file(self):
         """Load expressions from file and analyze (supports cycles)."""
@@ -457,9 +571,20 @@ class DependencyAnalyzerUI:
             print("    No file path entered.")
             return
         
+        # Parse expressions from file, streamed line by line instead of read into a list
+        expressions = {}
         try:
             with open(filepath, 'r') as f:
-                lines = f.readlines()
+                for line in f:
+                    line = line.strip()
+                    if not line or line.startswith('#') or '=' not in line:
+                        continue
+                    
+                    key, exp = line.split('=', 1)
+                    # interned like the main tokenizer does, so graph lookups compare by identity first
+                    key = sys.intern(key.strip())
+                    # Simple tokenizer for dependencies
+                    expressions[key] = list(map(sys.intern, _NAME_RE.findall(exp)))
         except FileNotFoundError:
             print(f"    File not found: {filepath}")
             return
@@ -467,29 +592,6 @@ class DependencyAnalyzerUI:
             print(f"    Error reading file: {e}")
             return
         
-        # Parse expressions from file
-        expressions = {}
-        for line in lines:
-            line = line.strip()
-            if not line or line.startswith('#') or '=' not in line:
-                continue
-            
-            key, exp = line.split('=', 1)
-            key = key.strip()
-            # Simple tokenizer for dependencies
-            tokens = []
-            current = ''
-            for char in exp:
-                if char.isalpha():
-                    current += char
-                else:
-                    if current:
-                        tokens.append(current)
-                        current = ''
-            if current:
-                tokens.append(current)
-            expressions[key] = tokens
-        
         if not expressions:
             print("    No valid expressions found in file.")
             return
@@ -532,18 +634,33 @@ class DependencyAnalyzerUI:
         # Show all dependencies
         print(f"\n    ALL DEPENDENCIES")
         print(f"    {'.' * 50}")
-        for var in sorted(file_analyzer.get_defined_variables(), key=str.lower):
+        lines = []
+        for var in file_analyzer.get_sorted_defined_variables():
             deps = file_analyzer.get_dependencies(var)
             exp_str = file_analyzer.get_expression_string(var)
             if deps:
-                print(f"    {var} = {exp_str}")
-                print(f"        --> depends on: {', '.join(sorted(deps, key=str.lower))}")
+                lines.append(f"    {var} = {exp_str}\n")
+                lines.append(f"        --> depends on: {', '.join(sorted(deps, key=str.lower))}\n")
             else:
-                print(f"    {var} = {exp_str}")
-                print(f"        --> (independent)")
+                lines.append(f"    {var} = {exp_str}\n")
+                lines.append(f"        --> (independent)\n")
+        sys.stdout.write(''.join(lines))
+
+
+# last analyzer built from a hash table and the table version it saw
+_analysis_cache = None
+
+
+def get_analyzer(hash_table, dependencies=None):
+    """Reuse the last analyzer while the hash table has not been written to."""
+    global _analysis_cache
+    if (_analysis_cache is None or _analysis_cache[0] is not hash_table
+            or _analysis_cache[1] != hash_table.version):
+        _analysis_cache = (hash_table, hash_table.version, DependencyAnalyzer(hash_table, dependencies=dependencies))
+    return _analysis_cache[2]
 
 
-def run_dependency_analyzer(hash_table):
+def run_dependency_analyzer(hash_table, dependencies=None):
     """Main entry point for the dependency analyzer feature."""
-    ui = DependencyAnalyzerUI(hash_table)
+    ui = DependencyAnalyzerUI(hash_table, dependencies)
     ui.run()
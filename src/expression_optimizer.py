@@ -1,47 +1,150 @@
-from structures.BinaryTree import BinaryTree
+import math
+import sys
+from functools import lru_cache
+from structures.DASK_ParseTree import DASK_ParseTree, OPERATIONS
 from structures.Stack import Stack
 
 
+@lru_cache(maxsize=None)
+def _parse_num(value):
+    """Returns (is_number, number) for a leaf key, parsed once per distinct string."""
+    try:
+        return True, float(value)
+    except (ValueError, TypeError):
+        return False, None
+
+
+# most rewrites _apply_rules will chain on one node
+MAX_REWRITES = 16
+
+# operators whose operands can be swapped
+COMMUTATIVE = frozenset(('+', '*'))
+
+# leaf keys for the whole numbers folding produces most, so they skip int() and str()
+_SMALL_INT_KEYS = {float(i): str(i) for i in range(-8, 16)}
+
+
 class ExpressionOptimizer:
     """Optimizes and simplifies DASK expressions using algebraic rules."""
     
-    def __init__(self):
-        self.operations = ['+', '-', '/', '*', '**', '++', '//']
+    def __init__(self, parser=None):
+        self.operations = OPERATIONS
+        # nodes are interned through the parser so equal subtrees are the same object,
+        # trees passed to optimize should come from this same parser
+        self.parser = parser if parser is not None else DASK_ParseTree()
         self.optimizations_applied = []
+        self._opt_cache = {}
+        # id(node) -> (node, class id) and signature -> class id, see _class_id
+        self._class_ids = {}
+        self._classes = {}
     
     def optimize(self, tree):
         """Main optimization method. Returns an optimized copy of the tree."""
         self.optimizations_applied = []
-        return self._optimize_node(tree)
+        self._opt_cache = {}
+        self._class_ids = {}
+        self._classes = {}
+        optimized = self._optimize_node(tree)
+        # the caches hold on to every node they saw, so they are only kept for one run
+        self._opt_cache = {}
+        self._class_ids = {}
+        self._classes = {}
+        return optimized
+
+    def _class_id(self, node):
+        """Number shared by every subtree equal to node, + and * operands may be in either order."""
+        class_ids = self._class_ids
+        stack = [node]
+        while stack:
+            current = stack[-1]
+            if id(current) in class_ids:
+                stack.pop()
+                continue
+
+            left = current.getLeftTree()
+            right = current.getRightTree()
+            pending = [child for child in (right, left) if child is not None and id(child) not in class_ids]
+            if pending:
+                stack.extend(pending)
+                continue
+
+            op = current.getKey()
+            if left is None and right is None:
+                sig = op
+            else:
+                left_id = class_ids[id(left)][1] if left is not None else -1
+                right_id = class_ids[id(right)][1] if right is not None else -1
+                # operand order does not matter for these so both orders share a signature
+                if op in COMMUTATIVE and right_id < left_id:
+                    sig = (op, right_id, left_id)
+                else:
+                    sig = (op, left_id, right_id)
+
+            # the node is kept next to its id so no other node can reuse the id during this run
+            class_ids[id(current)] = (current, self._classes.setdefault(sig, len(self._classes)))
+            stack.pop()
+
+        return class_ids[id(node)][1]
+
+    def _equivalent(self, left, right):
+        """True if both subtrees are the same expression, even when a + or * has its operands swapped."""
+        return left is right or self._class_id(left) == self._class_id(right)
     
     def _optimize_node(self, node):
-        """Recursively optimize using post-order traversal."""
+        """Optimize using an iterative post-order traversal."""
         if node is None:
             return None
-        
-        left = node.getLeftTree()
-        right = node.getRightTree()
-        op = node.getKey()
-        
-        # Leaf node - return as-is
-        if left is None and right is None:
-            return BinaryTree(op)
-        
-        # Optimize subtrees first (post-order)
-        optimized_left = self._optimize_node(left)
-        optimized_right = self._optimize_node(right)
-        
-        return self._apply_rules(op, optimized_left, optimized_right)
-    
-    def _is_number(self, value):
-        try:
-            float(value)
-            return True
-        except (ValueError, TypeError):
-            return False
-    
-    def _get_number(self, value):
-        return float(value)
+
+        results = []
+        stack = [(node, 0)]
+        while stack:
+            node, visited = stack.pop()
+            if node is None:
+                results.append(None)
+                continue
+
+            left = node.getLeftTree()
+            right = node.getRightTree()
+            op = node.getKey()
+
+            # Leaf node - return as-is, leaves are never edited so it can be shared
+            if left is None and right is None:
+                results.append(node)
+
+            # Both subtrees are optimized by now (post-order)
+            elif visited:
+                optimized_right = results.pop()
+                optimized_left = results.pop()
+                # children are interned so equal subtrees have equal ids
+                key = (op, id(optimized_left), id(optimized_right))
+
+                cached = self._opt_cache.get(key)
+                if cached is None:
+                    # identical subtree not seen yet this run
+                    start = len(self.optimizations_applied)
+                    new_node = self._apply_rules(op, optimized_left, optimized_right)
+                    if new_node is None:
+                        # no rule fired, the original node is reused unless a child changed
+                        if optimized_left is left and optimized_right is right:
+                            new_node = node
+                        else:
+                            new_node = self.parser.intern_node(op, optimized_left, optimized_right)
+                    # the children are kept with the entry so their ids can't be reused during the run
+                    cached = (new_node, self.optimizations_applied[start:], optimized_left, optimized_right)
+                    self._opt_cache[key] = cached
+                else:
+                    # same optimizations are reported again for every occurrence
+                    self.optimizations_applied.extend(cached[1])
+
+                results.append(cached[0])
+
+            else:
+                # right is pushed first so left is optimized first, same order as before
+                stack.append((node, 1))
+                stack.append((right, 0))
+                stack.append((left, 0))
+
+        return results.pop()
     
     def _is_leaf(self, node):
         return node.getLeftTree() is None and node.getRightTree() is None
@@ -52,97 +155,120 @@ class ExpressionOptimizer:
         return None
     
     def _create_number_node(self, value):
+        # folded values are floats, nodes come from the parser so each key is one shared leaf
+        if isinstance(value, float):
+            if value.is_integer():
+                key = _SMALL_INT_KEYS.get(value)
+                return self.parser.intern_node(key if key is not None else str(int(value)))
+            if math.isfinite(value):
+                return self.parser.intern_node(str(value))
+        # inf, nan and complex results still raise here like before
         if value == int(value):
-            return BinaryTree(str(int(value)))
-        return BinaryTree(str(value))
+            return self.parser.intern_node(str(int(value)))
+        return self.parser.intern_node(str(value))
     
     def _summative(self, n):
         """Calculate the summative of n: ∑n = n + (n-1) + ... + 1 = n*(n+1)/2"""
         n = int(n)
         return n * (n + 1) / 2
     
+    def _canonicalize(self, op, left, right):
+        """Order the operands of + and * so a constant is always on the right."""
+        if op in COMMUTATIVE and _parse_num(self._get_leaf_value(left) or '')[0]:
+            if not _parse_num(self._get_leaf_value(right) or '')[0]:
+                return right, left
+        return left, right
+    
     def _apply_rules(self, op, left, right):
-        """Apply algebraic simplification rules."""
+        """Apply algebraic simplification rules until none of them fire. Returns None if nothing changed."""
+        # rules only look for constants on the right, if none of them fire the swap is dropped
+        # so the expression keeps the order it was written in
+        canon_left, canon_right = self._canonicalize(op, left, right)
+        node = self._apply_once(op, canon_left, canon_right, swapped=canon_left is not left)
+        # bounded in case a future rule keeps rewriting back and forth
+        for _ in range(MAX_REWRITES):
+            if node is None or self._is_leaf(node):
+                break
+            next_node = self._apply_once(node.getKey(), node.getLeftTree(), node.getRightTree())
+            if next_node is None:
+                break
+            node = next_node
+        return node
+    
+    def _apply_once(self, op, left, right, swapped=False):
+        """Apply the first matching rule. Returns None if no rule matches."""
+        # swapped means _canonicalize moved the constant to the right, messages show the written order
         left_val = self._get_leaf_value(left)
         right_val = self._get_leaf_value(right)
         
-        left_is_num = self._is_number(left_val) if left_val else False
-        right_is_num = self._is_number(right_val) if right_val else False
+        left_is_num, left_num = _parse_num(left_val) if left_val else (False, None)
+        right_is_num, right_num = _parse_num(right_val) if right_val else (False, None)
         
         # Constant Folding
         if left_is_num and right_is_num:
-            result = self._evaluate_constants(op, self._get_number(left_val), self._get_number(right_val))
+            result = self._evaluate_constants(op, left_num, right_num)
             if result is not None:
                 self.optimizations_applied.append(f"Constant folding: ({left_val} {op} {right_val}) => {result}")
                 return self._create_number_node(result)
         
-        # Addition identity rules
+        # Addition identity rules, constants are already on the right for + and *
         if op == '+':
-            if right_is_num and self._get_number(right_val) == 0:
-                self.optimizations_applied.append(f"Identity: ({left_val or 'expr'} + 0) => {left_val or 'expr'}")
+            if right_is_num and right_num == 0:
+                written = f"(0 + {left_val or 'expr'})" if swapped else f"({left_val or 'expr'} + 0)"
+                self.optimizations_applied.append(f"Identity: {written} => {left_val or 'expr'}")
                 return left
-            if left_is_num and self._get_number(left_val) == 0:
-                self.optimizations_applied.append(f"Identity: (0 + {right_val or 'expr'}) => {right_val or 'expr'}")
-                return right
         
         # Subtraction rules
         if op == '-':
-            if right_is_num and self._get_number(right_val) == 0:
+            if right_is_num and right_num == 0:
                 self.optimizations_applied.append(f"Identity: ({left_val or 'expr'} - 0) => {left_val or 'expr'}")
                 return left
-            if left_val and right_val and left_val == right_val:
-                self.optimizations_applied.append(f"Self-cancellation: ({left_val} - {right_val}) => 0")
-                return BinaryTree('0')
+            if self._equivalent(left, right):
+                self.optimizations_applied.append(f"Self-cancellation: ({left_val or 'expr'} - {right_val or 'expr'}) => 0")
+                return self.parser.intern_node('0')
         
         # Multiplication rules
         if op == '*':
-            if right_is_num and self._get_number(right_val) == 1:
-                self.optimizations_applied.append(f"Identity: ({left_val or 'expr'} * 1) => {left_val or 'expr'}")
+            if right_is_num and right_num == 1:
+                written = f"(1 * {left_val or 'expr'})" if swapped else f"({left_val or 'expr'} * 1)"
+                self.optimizations_applied.append(f"Identity: {written} => {left_val or 'expr'}")
                 return left
-            if left_is_num and self._get_number(left_val) == 1:
-                self.optimizations_applied.append(f"Identity: (1 * {right_val or 'expr'}) => {right_val or 'expr'}")
-                return right
-            if right_is_num and self._get_number(right_val) == 0:
-                self.optimizations_applied.append(f"Zero rule: ({left_val or 'expr'} * 0) => 0")
-                return BinaryTree('0')
-            if left_is_num and self._get_number(left_val) == 0:
-                self.optimizations_applied.append(f"Zero rule: (0 * {right_val or 'expr'}) => 0")
-                return BinaryTree('0')
+            if right_is_num and right_num == 0:
+                written = f"(0 * {left_val or 'expr'})" if swapped else f"({left_val or 'expr'} * 0)"
+                self.optimizations_applied.append(f"Zero rule: {written} => 0")
+                return self.parser.intern_node('0')
         
         # Division rules
         if op == '/':
-            if right_is_num and self._get_number(right_val) == 1:
+            if right_is_num and right_num == 1:
                 self.optimizations_applied.append(f"Identity: ({left_val or 'expr'} / 1) => {left_val or 'expr'}")
                 return left
-            if left_is_num and self._get_number(left_val) == 0:
-                if not (right_is_num and self._get_number(right_val) == 0):
+            if left_is_num and left_num == 0:
+                if not (right_is_num and right_num == 0):
                     self.optimizations_applied.append(f"Zero rule: (0 / {right_val or 'expr'}) => 0")
-                    return BinaryTree('0')
-            if left_val and right_val and left_val == right_val:
-                self.optimizations_applied.append(f"Self-cancellation: ({left_val} / {right_val}) => 1")
-                return BinaryTree('1')
+                    return self.parser.intern_node('0')
+            if self._equivalent(left, right):
+                self.optimizations_applied.append(f"Self-cancellation: ({left_val or 'expr'} / {right_val or 'expr'}) => 1")
+                return self.parser.intern_node('1')
         
         # Power rules
         if op == '**':
-            if right_is_num and self._get_number(right_val) == 1:
+            if right_is_num and right_num == 1:
                 self.optimizations_applied.append(f"Identity: ({left_val or 'expr'} ** 1) => {left_val or 'expr'}")
                 return left
-            if right_is_num and self._get_number(right_val) == 0:
+            if right_is_num and right_num == 0:
                 self.optimizations_applied.append(f"Power rule: ({left_val or 'expr'} ** 0) => 1")
-                return BinaryTree('1')
-            if left_is_num and self._get_number(left_val) == 1:
+                return self.parser.intern_node('1')
+            if left_is_num and left_num == 1:
                 self.optimizations_applied.append(f"Power rule: (1 ** {right_val or 'expr'}) => 1")
-                return BinaryTree('1')
-            if left_is_num and self._get_number(left_val) == 0:
-                if right_is_num and self._get_number(right_val) > 0:
+                return self.parser.intern_node('1')
+            if left_is_num and left_num == 0:
+                if right_is_num and right_num > 0:
                     self.optimizations_applied.append(f"Power rule: (0 ** {right_val}) => 0")
-                    return BinaryTree('0')
+                    return self.parser.intern_node('0')
         
-        # No simplification - return new node with optimized children
-        new_node = BinaryTree(op)
-        new_node.left_tree = left
-        new_node.right_tree = right
-        return new_node
+        # No simplification - caller keeps or rebuilds the node
+        return None
     
     def _evaluate_constants(self, op, left_val, right_val):
         """Evaluate operation on two constant values."""
@@ -180,23 +306,65 @@ class ExpressionOptimizer:
 
 def tree_to_expression(tree, parenthesize=True):
     """Convert parse tree to string expression."""
-    if tree is None:
-        return ""
-    
-    left = tree.getLeftTree()
-    right = tree.getRightTree()
-    key = tree.getKey()
-    
-    if left is None and right is None:
-        return str(key)
+    parts = []
+    # strings on the stack are written as is, nodes still have to be expanded
+    stack = [tree]
+    while stack:
+        item = stack.pop()
+        if item is None:
+            continue
+        if isinstance(item, str):
+            parts.append(item)
+            continue
+        
+        left = item.getLeftTree()
+        right = item.getRightTree()
+        key = item.getKey()
+        
+        if left is None and right is None:
+            parts.append(str(key))
+            continue
+        
+        # pushed in reverse so they pop in reading order
+        if parenthesize:
+            stack.append(")")
+        stack.append(right)
+        stack.append(f" {key} ")
+        stack.append(left)
+        if parenthesize:
+            stack.append("(")
     
-    left_expr = tree_to_expression(left, parenthesize)
-    right_expr = tree_to_expression(right, parenthesize)
+    return "".join(parts)
+
+
+def tree_to_tokens(tree):
+    """Convert parse tree to the token list of its parenthesized expression."""
+    tokens = []
+    stack = [tree]
+    while stack:
+        item = stack.pop()
+        if item is None:
+            continue
+        if isinstance(item, str):
+            tokens.append(item)
+            continue
+        
+        left = item.getLeftTree()
+        right = item.getRightTree()
+        key = item.getKey()
+        
+        if left is None and right is None:
+            # folded numbers like -1.5 stay one token, the tokenizer would split them
+            tokens.append(str(key))
+            continue
+        
+        stack.append(")")
+        stack.append(right)
+        stack.append(key)
+        stack.append(left)
+        stack.append("(")
     
-    if parenthesize:
-        return f"({left_expr} {key} {right_expr})"
-    else:
-        return f"{left_expr} {key} {right_expr}"
+    return tokens
 
 
 class ExpressionOptimizerUI:
@@ -205,7 +373,20 @@ class ExpressionOptimizerUI:
     def __init__(self, hash_table, parser):
         self.hash_table = hash_table
         self.parser = parser
-        self.optimizer = ExpressionOptimizer()
+        self.optimizer = ExpressionOptimizer(parser)
+        # token tuple -> (tree, optimized tree, optimizations), trees are never edited so they can be reused
+        self._result_cache = {}
+    
+    def _optimize_tokens(self, tokens):
+        """Parse and optimize tokens, cached per token tuple."""
+        key = tuple(tokens)
+        result = self._result_cache.get(key)
+        if result is None:
+            original_tree = self.parser.buildParseTree(tokens)
+            optimized_tree = self.optimizer.optimize(original_tree)
+            result = (original_tree, optimized_tree, self.optimizer.get_optimizations())
+            self._result_cache[key] = result
+        return result
     
     def display_menu(self):
         menu = '''
@@ -247,11 +428,12 @@ class ExpressionOptimizerUI:
         print("OPTIMIZE SINGLE EXPRESSION")
         print("=" * 50)
         
-        variables = [var for var, _ in self.hash_table.items()]
-        if not variables:
+        if not self.hash_table:
             print("\nNo expressions stored. Please add expressions first.")
             return
         
+        variables = [var for var, _ in self.hash_table.items()]
+        
         print("\nAvailable variables:", ", ".join(sorted(variables)))
         var_name = input("\nEnter variable name to optimize: ").strip()
         
@@ -261,12 +443,9 @@ class ExpressionOptimizerUI:
             return
         
         original_tokens = dask_obj.expression
-        original_expr = ''.join(original_tokens)
-        original_tree = self.parser.buildParseTree(original_tokens)
-        
-        optimized_tree = self.optimizer.optimize(original_tree)
+        original_expr = dask_obj.text
+        original_tree, optimized_tree, optimizations = self._optimize_tokens(original_tokens)
         optimized_expr = tree_to_expression(optimized_tree)
-        optimizations = self.optimizer.get_optimizations()
         
         print("\n" + "-" * 50)
         print(f"Variable: {var_name}")
@@ -295,8 +474,7 @@ class ExpressionOptimizerUI:
         if optimizations:
             update = input("\nUpdate stored expression with optimized version? (Y/N): ").strip().upper()
             if update == 'Y':
-                optimized_tokens = self.parser.tokenizer(optimized_expr)
-                dask_obj.expression = optimized_tokens
+                dask_obj.expression = tree_to_tokens(optimized_tree)
                 self.hash_table[var_name] = dask_obj
                 print(f"Expression for '{var_name}' has been updated!")
             else:
@@ -307,37 +485,35 @@ class ExpressionOptimizerUI:
         print("OPTIMIZE ALL EXPRESSIONS")
         print("=" * 50)
         
-        variables = [(var, dask_obj) for var, dask_obj in self.hash_table.items()]
-        if not variables:
+        if not self.hash_table:
             print("\nNo expressions stored. Please add expressions first.")
             return
         
+        variables = [(var, dask_obj) for var, dask_obj in self.hash_table.items()]
+        
         total_optimizations = 0
         optimized_count = 0
         
-        print("\n{:<10} {:<25} {:<25} {:<5}".format("Variable", "Original", "Optimized", "Opts"))
-        print("-" * 70)
+        row_format = "{:<10} {:<25} {:<25} {:<5}"
+        ellipsize = lambda expr: expr[:22] + "..." if len(expr) > 25 else expr
+        # header, rows and footer rule go out in one write
+        rows = ["", row_format.format("Variable", "Original", "Optimized", "Opts"), "-" * 70]
         
         for var, dask_obj in sorted(variables, key=lambda x: x[0].lower()):
             original_tokens = dask_obj.expression
-            original_expr = ''.join(original_tokens)
-            original_tree = self.parser.buildParseTree(original_tokens)
-            
-            optimized_tree = self.optimizer.optimize(original_tree)
+            original_expr = dask_obj.text
+            _, optimized_tree, optimizations = self._optimize_tokens(original_tokens)
             optimized_expr = tree_to_expression(optimized_tree)
-            optimizations = self.optimizer.get_optimizations()
             
             num_opts = len(optimizations)
             total_optimizations += num_opts
             if num_opts > 0:
                 optimized_count += 1
             
-            orig_display = original_expr[:22] + "..." if len(original_expr) > 25 else original_expr
-            opt_display = optimized_expr[:22] + "..." if len(optimized_expr) > 25 else optimized_expr
-            
-            print("{:<10} {:<25} {:<25} {:<5}".format(var, orig_display, opt_display, num_opts))
+            rows.append(row_format.format(var, ellipsize(original_expr), ellipsize(optimized_expr), num_opts))
         
-        print("-" * 70)
+        rows.append("-" * 70)
+        sys.stdout.write("\n".join(rows) + "\n")
         print(f"\nSummary:")
         print(f"  Total expressions: {len(variables)}")
         print(f"  Expressions optimized: {optimized_count}")
@@ -349,15 +525,11 @@ class ExpressionOptimizerUI:
             if update == 'Y':
                 updated = 0
                 for var, dask_obj in variables:
-                    original_tokens = dask_obj.expression
-                    original_tree = self.parser.buildParseTree(original_tokens)
-                    optimized_tree = self.optimizer.optimize(original_tree)
-                    optimizations = self.optimizer.get_optimizations()
+                    # already optimized in the table above so this is a cache hit
+                    _, optimized_tree, optimizations = self._optimize_tokens(dask_obj.expression)
                     
                     if optimizations:
-                        optimized_expr = tree_to_expression(optimized_tree)
-                        optimized_tokens = self.parser.tokenizer(optimized_expr)
-                        dask_obj.expression = optimized_tokens
+                        dask_obj.expression = tree_to_tokens(optimized_tree)
                         self.hash_table[var] = dask_obj
                         updated += 1
                 
@@ -384,10 +556,8 @@ class ExpressionOptimizerUI:
             return
         
         tokens = self.parser.tokenizer(expression)
-        original_tree = self.parser.buildParseTree(tokens)
-        optimized_tree = self.optimizer.optimize(original_tree)
+        original_tree, optimized_tree, optimizations = self._optimize_tokens(tokens)
         optimized_expr = tree_to_expression(optimized_tree)
-        optimizations = self.optimizer.get_optimizations()
         
         print("\n" + "-" * 50)
         print(f"Original Expression:  {expression}")
@@ -1,13 +1,19 @@
 from src.tree_to_json import tree_to_json
 
-def get_dask_data(topological_graph, sorted_map, tree_builder):
+def get_dask_data(dependencies, sorted_map, tree_builder):
     data = {}
-    # we get the graph edges
-    data['edges'] = list(topological_graph.edges)
+    # we get the graph edges, dep -> key since key relies on dep
+    # and all the nodes in the same pass
+    # we have to derive nodes from the edges to due with 'undefined' nodes that are not saved in hash table
+    edges = []
+    nodes = set()
+    for key, deps in dependencies.items():
+      for dep in deps:
+        edge = (dep, key)
+        edges.append(edge)
+        nodes.update(edge)
 
-    # we get all the nodes
-    # we have to derive from graph_edges to due with 'undefined' nodes that are not saved in hash table
-    nodes = {i for edge in data['edges'] for i in edge} # set 
+    data['edges'] = edges
     data['nodes'] = list(nodes)
 
     # we get all the parse trees and each expressions' data
@@ -15,7 +21,7 @@ def get_dask_data(topological_graph, sorted_map, tree_builder):
     meta_data = {}
     for key, dask_obj in sorted_map.items():
       # parse tree
-      tree = tree_builder(dask_obj.expression)
+      tree = tree_builder(dask_obj)
       json_tree = tree_to_json(tree)
 
       parse_trees[key] = json_tree
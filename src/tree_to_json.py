@@ -2,15 +2,25 @@
 def tree_to_json(tree):
   if tree is None:
       return None
-  node = {}
-  node['value'] = tree.getKey()
-  left = tree.getLeftTree()
-  right = tree.getRightTree()
+  root = {}
+  # each node is paired with the dict its parent already linked in for it
+  stack = [(tree, root)]
 
-  if left != None:
-    node['left'] = tree_to_json(left)
+  while stack:
+    node, out = stack.pop()
+    out['value'] = node.getKey()
+    left = node.getLeftTree()
+    right = node.getRightTree()
 
-  if right != None:
-    node['right'] = tree_to_json(right)
+    if left != None:
+      out['left'] = {}
+
+    if right != None:
+      out['right'] = {}
+      stack.append((right, out['right']))
+
+    if left != None:
+      stack.append((left, out['left']))
+
+  return root
 
-  return node
\ No newline at end of file
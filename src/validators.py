@@ -14,30 +14,32 @@ def input_file_path(prompt) -> str:
     return file_path
 
 def dask_input(prompt, allow_quit=False):
-    dask = input(prompt)
+    # keeps asking until the input is valid, a loop so retries never grow the stack
+    while True:
+        dask = input(prompt).strip()
 
-    # quit check
-    if allow_quit and dask.strip().lower() == 'q':
-        return 'q', 'q'
+        # quit check
+        if allow_quit and dask.lower() == 'q':
+            return 'q', 'q'
 
-    # basic format check
-    if dask.strip() == '' or '=' not in dask:
-        print('That is not a valid DASK expression! Please try again\n')
-        return dask_input(prompt, allow_quit)
+        # basic format check
+        if dask == '' or '=' not in dask:
+            print('That is not a valid DASK expression! Please try again\n')
+            continue
 
-    key, exp = dask.strip().split('=', 1)
+        key, _, exp = dask.partition('=')
 
-    # expression validation
-    if not parser.verify_expression(exp):
-        print('That is not a valid DASK expression! Please try again\n')
-        return dask_input(prompt, allow_quit)
+        # expression validation
+        if not parser.verify_expression(exp):
+            print('That is not a valid DASK expression! Please try again\n')
+            continue
 
-    return key, exp
+        return key, exp
 
 def yes_no_input(prompt) -> str:
-    choice = input(prompt)
-    while choice.lower() not in ['y', 'n']:
+    choice = input(prompt).lower()
+    while choice not in ['y', 'n']:
         print('That is not a valid choice. Please try again!\n')
-        choice = input(prompt)
+        choice = input(prompt).lower()
 
-    return choice.lower() 
\ No newline at end of file
+    return choice
@@ -1,4 +1,7 @@
 class BinaryTree:
+    # fixed attributes, no per object __dict__, __weakref__ lets the parser's node table hold them weakly
+    __slots__ = ('key', 'left_tree', 'right_tree', '__weakref__')
+
     def __init__(self, key, left=None, right=None):
         self.left_tree = left
         self.right_tree = right
@@ -18,27 +21,33 @@ class BinaryTree:
         return self.right_tree
 
     def insertLeft(self, tree):
-        if self.left_tree == None:
-            self.left_tree = tree
-
-        else:
-            # there alr is a tree
-            self.left_tree.insertLeft(tree)
-
+        # walk down to the first free left slot, no recursion per level
+        node = self
+        while node.left_tree != None:
+            node = node.left_tree
+        node.left_tree = tree
         return
 
     def insertRight(self , tree):
-        if self.right_tree == None:
-            self.right_tree = tree
-        else:
-            self.right_tree.insertRight(tree)
+        node = self
+        while node.right_tree != None:
+            node = node.right_tree
+        node.right_tree = tree
         return
 
     def print_tree_inorder(self, level=0):
-      if self.getLeftTree() is not None:
-        self.getLeftTree().print_tree_inorder(level + 1)
-
-      print('.' * level + str(self.getKey()))
-
-      if self.getRightTree() is not None:
-        self.getRightTree().print_tree_inorder(level + 1)
+      # explicit stack instead of recursion so deep expressions can't hit the recursion limit
+      stack = []
+      node = self
+      while stack or node is not None:
+        # go as far left as possible, remembering each node and its depth
+        while node is not None:
+          stack.append((node, level))
+          node = node.getLeftTree()
+          level += 1
+
+        node, level = stack.pop()
+        print('.' * level + str(node.getKey()))
+
+        node = node.getRightTree()
+        level += 1
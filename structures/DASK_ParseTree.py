@@ -1,184 +1,235 @@
+import operator
+import re
+import sys
+import weakref
+from functools import lru_cache
 from structures.BinaryTree import BinaryTree
-from structures.Stack import Stack
+
+# set so membership checks are a hash lookup instead of scanning a list
+OPERATIONS = frozenset(('+' , '-' , '/' , '*' , '**' , '++' , '//'))
+
+# longer operators first so ** is not read as two *
+# any other char becomes a token of its own so verify_tokens rejects it instead of it vanishing
+_TOKEN_RE = re.compile(r'\*\*|\+\+|//|[()+\-*/]|[\d.]+|[^\W\d_]+|\S')
+
+@lru_cache(maxsize=4096)
+def _tokenize(exp):
+  # same expressions get tokenized again by the optimizer and validators
+  # whitespace is dropped first so spaces and tabs still never split a name or number
+  tokens = _TOKEN_RE.findall(''.join(exp.split()))
+  # variable names are interned so every lookup of the same name shares one string and its cached hash
+  return tuple(sys.intern(t) if t.isalpha() else t for t in tokens)
+
+# a name or a number with at most one dot, digits may be left out on one side of it like 1. or .5
+_VALUE_RE = re.compile(r'[^\W\d_]+|\d+\.?\d*|\.\d+')
+
+def _is_value(token):
+  return _VALUE_RE.fullmatch(token) is not None
+
 
 class DASK_ParseTree:
   def __init__(self):
-    self.operations = ['+' , '-' , '/' , '*' , '**' , '++' , '//']
+    self.operations = OPERATIONS
+    # every live node made by this parser, so equal subtrees are one shared object
+    # weak so a node goes away once no tree or Dask uses it anymore
+    self._cons_table = weakref.WeakValueDictionary()
+    # operator -> function of the two operand values
+    self._ops = {
+      '+': operator.add,
+      '-': operator.sub,
+      '/': operator.truediv,
+      '*': operator.mul,
+      '**': operator.pow,
+      '++': lambda a, b: self.summative(a) + self.summative(b),
+      '//': lambda a, b: self.summative(a) / self.summative(b),
+    }
 
 
   def verify_expression(self, exp):
     '''
     Returns False if bad, True if ok
     '''
-    tokens = self.tokenizer(exp)
-    stack = Stack()
-    for t in tokens:
-
-      if t == ')':
-        # we backtrack the stack
-        if stack.is_empty():
-          return False
-
-        exp_group = []
-        while not stack.is_empty():
-          top = stack.pop() 
+    return self.verify_tokens(self.tokenizer(exp))
 
-          if top == '(':
-            break
-          else:
-            exp_group.append(top)
+  def verify_tokens(self, tokens):
+    '''
+    Same check as verify_expression on an already tokenized expression
+    '''
+    ops = self.operations
+    stack = []
+    for t in tokens:
+      if t != ')':
+        stack.append(t)
+        continue
 
-        else:
-          # we didnt find a matching (
+      # the only valid groups are (value) and (value op value)
+      # so the nearest ( has to be 2 or 4 from the top, anything else is bad
+      if len(stack) >= 2 and stack[-2] == '(' and stack[-1] != '(':
+        # single value expression ok
+        if not _is_value(stack[-1]):
           return False
+        del stack[-2:]
 
-        exp_group.reverse()
-        # now we have a expression group
-        # since we are dealing with binary trees the only exp check is len(3), start end in brackets, 2 values. mid is operator
-
-        if len(exp_group) == 1 and (exp_group[0].isalpha() or exp_group[0].replace('.','',1).isdigit()):
-          # single value expression ok
-          stack.push('EXP')
-          continue
-
-        if len(exp_group) != 3:
-          return False
-        # operator
-        if exp_group[1] not in self.operations:
-          return False
-        # values
-        if not (exp_group[0].isalpha() or exp_group[0].replace('.','',1).isdigit()):
+      elif len(stack) >= 4 and stack[-4] == '(' and '(' not in stack[-3:]:
+        left, op, right = stack[-3:]
+        if op not in ops or not _is_value(left) or not _is_value(right):
           return False
-        if not (exp_group[2].isalpha() or exp_group[2].replace('.','',1).isdigit()):
-          return False
-
-        # push a placeholder variabel
-        stack.push('EXP')
+        del stack[-4:]
 
-        
       else:
-        stack.push(t)
-        
+        # no matching ( or the wrong number of items in the brackets
+        return False
+
+      # push a placeholder variabel
+      stack.append('EXP')
 
-      # we should end with 'EXP' only
-    return stack.size() == 1 and stack.pop() == 'EXP'
+    # we should end with 'EXP' only
+    return len(stack) == 1 and stack[0] == 'EXP'
         
   def summative(self , a ):
     return a * ( a + 1 ) // 2 
 
   def tokenizer(self , exp):
-    tokens = []
-    for i in exp:
-      if i in ['(' , ')']:
-        tokens.append(i)
-      
-      elif i in self.operations:
-        if len(tokens) > 0 and tokens[-1] in self.operations:
-          # build token if multi-char operator
-          tokens[-1] = tokens[-1] + i
-        else:
-          # single char
-          tokens.append(i)
-
-      # All same logic as above
-      elif i.isdigit() or i == '.':
-        if len(tokens) > 0 and (tokens[-1].isdigit() or '.' in tokens[-1]):
-          tokens[-1] = tokens[-1] + i
-        else:
-          tokens.append(i)
-       
-      elif i.isalpha():
-        if len(tokens) > 0 and tokens[-1].isalpha():
-          tokens[-1] = tokens[-1] + i
-        else:
-          tokens.append(i)
-      
-      else:
-        # not a char what we want
-        continue
-    return tokens
+    # copied since callers keep the list as an expression's tokens
+    return list(_tokenize(exp))
+
+  def intern_node(self, key, left=None, right=None):
+      '''
+      Returns the shared node for key with these exact children, making it the first time
+      Nodes must not be edited afterwards since any number of trees may point at them
+      '''
+      # ids are safe as keys since a node keeps its children alive and its entry goes with it
+      sig = (key, id(left), id(right))
+      node = self._cons_table.get(sig)
+      if node is None:
+        node = self._cons_table[sig] = BinaryTree(key, left, right)
+      return node
 
   def buildParseTree(self, tokens):
-      # Just a check for single value expressions like (42) or (Pi)
-      if len(tokens) == 3:
-        # since all exps are paranthesized we just need to check len = 3
-        return BinaryTree(tokens[1])
-
-
-      tree = BinaryTree('?')
-      stack = Stack()
-      stack.push(tree)
-
-      currentTree = tree
+      # built bottom up so each node is interned once its children are known
+      # every '(' opens a [left, op, right] frame that becomes a node at its ')'
+      ops = self.operations
+      frames = [[None, None, None]]
 
       for t in tokens:
           if t == '(':
-              next_branch = BinaryTree('?')
-              currentTree.insertLeft(next_branch)
-              stack.push(currentTree)
-              currentTree = next_branch
-          elif t in self.operations:
-              currentTree.setKey(t)
-              right_branch = BinaryTree('?')
-              currentTree.insertRight(right_branch)
-              stack.push(currentTree)
-              currentTree = right_branch
+              frames.append([None, None, None])
+              continue
+          elif t in ops:
+              frames[-1][1] = t
+              continue
           elif t == ')':
-              currentTree = stack.pop()
+              if len(frames) == 1:
+                # stray bracket, nothing to close
+                continue
+              left, op, right = frames.pop()
+              # single value groups like (42) or (Pi) are just the value
+              node = left if op is None else self.intern_node(op, left, right)
           else:
-              currentTree.setKey(t)
-              currentTree = stack.pop()
-
-      return tree
-
-  def evaluate(self , tree, hash_table):
-      # post traversal
-      leftTree = tree.getLeftTree()
-      rightTree = tree.getRightTree()
-      op = tree.getKey()
-
-      # main evaluation
-      if leftTree != None and rightTree != None:
-        left_val = self.evaluate(leftTree, hash_table)
-        if left_val is None:
-            return None
-
-        right_val = self.evaluate(rightTree, hash_table)
-        if right_val is None:
-            return None
-
-        if op == '+':
-            return left_val + right_val
-        if op == '-':
-            return left_val - right_val
-        if op == '/':
-            return left_val / right_val
-        if op == '*':
-            return left_val * right_val
-        if op == '**':
-            return left_val ** right_val
-        if op == '++':
-            return self.summative(left_val) + self.summative(right_val)
-        if op == '//':
-            return self.summative(left_val) / self.summative(right_val)
+              node = self.intern_node(t)
 
+          frame = frames[-1]
+          if frame[1] is None:
+            frame[0] = node
+          else:
+            frame[2] = node
 
+      return frames[0][0]
 
+  def apply_operation(self, op, left_val, right_val):
+      func = self._ops.get(op)
+      if func is None:
         return None  # unknown operator
-      
-      # there is left right expression that evals to None and current is op
-      if op in self.operations:
-        return None
-      
-      if op.isalpha():
-        # query variable value from table
-        return hash_table[op].value if hash_table[op] != None else None
-
-      return float(op)
+      return func(left_val, right_val)
+
+  def to_postfix(self, tree):
+      '''
+      Flattens a parse tree into post order so evaluate_postfix can run it with a loop
+      Operators are stored as 1-tuples and the left operand is followed by an int,
+      the number of items to skip when it is None, so the right side is never evaluated.
+      Number leaves are converted to float once, other leaves stay as is
+      Operators on two numbers are folded into their float result here, the tree itself is left alone
+      '''
+      ops = self.operations
+      postfix = []
+      stack = [(tree, 0)]
+      while stack:
+        node, stage = stack.pop()
+        leftTree = node.getLeftTree()
+        rightTree = node.getRightTree()
+        op = node.getKey()
+
+        if leftTree != None and rightTree != None:
+          if stage == 0:
+            stack.append((node, 1))
+            stack.append((leftTree, 0))
+          elif stage == 1:
+            # placeholder for the skip length, filled in once the right side is emitted
+            stack.append((node, len(postfix) + 2))
+            postfix.append(0)
+            stack.append((rightTree, 0))
+          else:
+            jump_index = stage - 2
+            left_val = postfix[jump_index - 1]
+            right_val = postfix[-1]
+            # a float at the end of a side means that whole side is a single number
+            if isinstance(left_val, float) and isinstance(right_val, float) and len(postfix) == jump_index + 2:
+              try:
+                value = self.apply_operation(op, left_val, right_val)
+              except (ArithmeticError, ValueError):
+                # not folded so evaluation raises it like before
+                value = None
+              if isinstance(value, float):
+                postfix[jump_index - 1:] = [value]
+                continue
+
+            postfix[jump_index] = len(postfix) - jump_index
+            postfix.append((op,))
+
+        elif op in ops:
+          # there is left right expression that evals to None and current is op
+          postfix.append(None)
+        elif op.isalpha():
+          postfix.append(op)
+        else:
+          try:
+            postfix.append(float(op))
+          except ValueError:
+            # left as is so it fails only if evaluation reaches it
+            postfix.append(op)
+      return postfix
+
+  def evaluate_postfix(self, postfix, hash_table):
+      # evaluates the flat list from to_postfix with a value stack, no recursion
+      values = []
+      i = 0
+      while i < len(postfix):
+        item = postfix[i]
+        if item is None or isinstance(item, float):
+          values.append(item)
+        elif isinstance(item, int):
+          if values[-1] is None:
+            # left side is None so skip the right side and the operator
+            i += item
+        elif isinstance(item, tuple):
+          right_val = values.pop()
+          left_val = values.pop()
+          if right_val is None:
+            values.append(None)
+          else:
+            values.append(self.apply_operation(item[0], left_val, right_val))
+        elif item.isalpha():
+          # query variable value from table
+          dask_obj = hash_table[item]
+          values.append(dask_obj.value if dask_obj != None else None)
+        else:
+          values.append(float(item))
+        i += 1
+      return values.pop()
 
 if __name__ == '__main__':
   exp = "((a + b) * (c - d))"
   exp = "(24)"
   parser = DASK_ParseTree()
   tokens = parser.tokenizer(exp)
-  print("Is expression valid? ", parser.verify_expression(tokens))
+  print("Is expression valid? ", parser.verify_tokens(tokens))
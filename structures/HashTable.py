@@ -1,107 +1,232 @@
+from functools import lru_cache
+
+
 class Dask:
+  # fixed attributes, no per object __dict__
+  __slots__ = ('_expression', 'text', 'value', 'independent', 'tree', 'postfix')
+
   def __init__(self, expression, value, independent=False):
     self.expression = expression
     self.value = value
     self.independent = independent
+
+  @property
+  def expression(self):
+    return self._expression
+
+  @expression.setter
+  def expression(self, tokens):
+    self._expression = tokens
+    # joined once here since tokens are only ever replaced, never edited
+    self.text = ''.join(tokens)
+    # cached parse tree and postfix are only valid for the tokens they were built from
+    self.tree = None
+    self.postfix = None
+
   def __repr__(self):
-    return f'{"".join(self.expression)}=> {self.value}'
+    return f'{self.text}=> {self.value}'
   
+# 32 bit hash, its top bits pick the first slot and probing uses the rest to scatter
+@lru_cache(maxsize=4096)
+def _mix_hash(key):
+  # FNV-1a instead of the built in hash() since python randomizes that per process,
+  # this way the slot layout and items() order are the same every run
+  # the per character loop only runs once per key, after that it comes from the cache
+  if isinstance(key , str):
+    # unlike summing ords anagrams like ab and ba don't collide
+    hash_sum = 2166136261
+    for char in key:
+      hash_sum = ((hash_sum ^ ord(char)) * 16777619) & 0xFFFFFFFF
+  else:
+    # just int key
+    hash_sum = key
+
+  # fibonacci hashing, the high bits of the product are the well mixed ones
+  return (hash_sum * 2654435769) & 0xFFFFFFFF
+
 class HashTable:
     DELETE = object() # tombstone marker for deletion
+    DELETED = (DELETE, None) # the one entry every deleted slot shares
+    LINEAR_PROBES = 20 # probes that step to the next slot before switching to pseudorandom steps
+    MAX_LOAD = 0.7 # grow once keys and tombstones fill this much of the table
 
     def __init__(self , size):
-        self.size = size
-        self.keys = [None] * size
-        self.buckets= [None] * size
-
-    # this returns a index in my self.keys
-    def hashKey(self , key):
-      if isinstance(key , str):
-        hash_sum = 0
-        for char in key:
-            hash_sum += ord(char)
-      else:
-        # just int key
-        hash_sum = key
-
-      # idk where i found this formula
-      return hash_sum % self.size
+        self._count = 0 # number of stored keys
+        self.version = 0 # bumped on every write so readers can tell their snapshot is stale
+        self._allocate(size)
+
+    def _allocate(self, size):
+        # rounded up to a power of two so a probe can wrap around with a mask
+        self.size = 1 << max(size - 1, 0).bit_length()
+        self.mask = self.size - 1
+        # a key's first slot is the top bits of its 32 bit _mix_hash, as many as the size needs
+        self.shift = 32 - (self.size.bit_length() - 1)
+        # one (key, value) tuple per slot so a probe only reads one list
+        self.entries = [None] * self.size
+        self._tombstones = 0 # DELETED entries still sitting in the table
+        # keys and tombstones allowed before growing, worked out once per size
+        self._max_fill = int(self.size * HashTable.MAX_LOAD)
+        # enough probes to have seen every slot, 32 bit perturb is gone after 7 shifts
+        self._max_probes = HashTable.LINEAR_PROBES + 7 + self.size
+
+    def _resize(self, size):
+        # moves every stored pair into a fresh list, tombstones are left behind
+        old_items = list(self.items())
+        self._allocate(size)
+        entries = self.entries
+        mask = self.mask
+        linear = HashTable.LINEAR_PROBES
+        for entry in old_items:
+            # keys are unique and there are no tombstones so the first empty slot is theirs
+            perturb = _mix_hash(entry[0])
+            index = perturb >> self.shift
+            probes = 0
+            while entries[index] is not None:
+                probes += 1
+                if probes <= linear:
+                    index = (index + 1) & mask
+                else:
+                    perturb >>= 5
+                    index = (index * 5 + 1 + perturb) & mask
+            entries[index] = entry
+
+    # probing is written out in _resize, __setitem__, __getitem__ and pop, a shared generator cost more than the probing
+    # it starts at the slot from the top bits of _mix_hash and for the first LINEAR_PROBES probes
+    # steps to (index + 1) & mask since neighbouring slots are cheap, then if the chain is still going
+    # it steps to (index * 5 + 1 + perturb) & mask like cpython dicts so one big cluster can't make every lookup slow
+    # once perturb runs out 5*i+1 cycles through the whole table, so every slot is reached within _max_probes
 
     def items(self):
-      return ((k, v) for k, v in zip(self.keys, self.buckets) if k is not None and k != HashTable.DELETE)
+      deleted = HashTable.DELETED
+      return (e for e in self.entries if e is not None and e is not deleted)
+
 
+    def __len__(self):
+        return self._count
 
     def __setitem__(self , key , value):
-        index = self.hashKey(key)
-        start_index = index
+        # keeping the table sparse keeps probe chains short and means there is always room
+        if self._count + self._tombstones >= self._max_fill:
+            self._resize(self.size * 2)
+
+        entries = self.entries
+        perturb = _mix_hash(key)
+        index = perturb >> self.shift
+        probes = 0
+        free_index = None # first reusable slot, key may still sit further along the chain
 
         while True:
-            # if empty we just use
-            if self.keys[index] == None or self.keys[index] == HashTable.DELETE: 
-                # assign the key to this index (hash)
-                # assign value to same index
-                self.keys[index] = key
-                self.buckets[index] = value
+            entry = entries[index]
+
+            # if empty the key is not stored so we can stop
+            if entry is None:
+                if free_index is None:
+                    free_index = index
                 break
 
+            # deleted slots can be reused but the key might still come after them
+            if entry is HashTable.DELETED:
+                if free_index is None:
+                    free_index = index
+
             # overwrite if same
-            elif self.keys[index] == key:
-                self.buckets[index] = value
-                break
-            
-            # Find new key (we have hash collision)
+            elif entry[0] == key:
+                entries[index] = (entry[0], value)
+                self.version += 1
+                return
+
+            # otherwise we have hash collision and carry on probing
+            probes += 1
+            if probes <= HashTable.LINEAR_PROBES:
+                index = (index + 1) & self.mask
+            elif probes < self._max_probes:
+                perturb >>= 5
+                index = (index * 5 + 1 + perturb) & self.mask
             else:
-                index = self.hashKey(index + 1) # +1 for linear progression
+                # every slot has been seen
+                break
 
-                if index == start_index:
-                    # here we have considered the entire table
-                    # we litterally cannot accomodate for any more key-value-pairs
-                    break
+        if free_index is None:
+            # cannot happen while the table grows, but nothing to do if it ever did
+            return
 
-    def __getitem__(self, key):
-        # same idea of hashing and going over entire keys list
-        index = self.hashKey(key)
+        if entries[free_index] is HashTable.DELETED:
+            self._tombstones -= 1
 
-        start_index = index
+        # assign the key and value to this index (hash)
+        entries[free_index] = (key, value)
+        self._count += 1
+        self.version += 1
 
+    def __getitem__(self, key):
+        # same idea of hashing and going over entire entries list
+        entries = self.entries
+        perturb = _mix_hash(key)
+        index = perturb >> self.shift
+        probes = 0
 
         while True:
-            if self.keys[index] == None:
+            entry = entries[index]
+            if entry is None:
                 return None # key doesn't exist early exit
 
-            if self.keys[index] == key:
-                return self.buckets[index]
-
-            # there was collision during entry so we have to linearly cycle to the key
+            # a DELETED entry holds the DELETE marker which never equals a key
+            if entry[0] == key:
+                return entry[1]
+
+            # there was collision during entry so we have to probe to the key
+            probes += 1
+            if probes <= HashTable.LINEAR_PROBES:
+                index = (index + 1) & self.mask
+            elif probes < self._max_probes:
+                perturb >>= 5
+                index = (index * 5 + 1 + perturb) & self.mask
             else:
-                index = self.hashKey(index + 1)
-
-                if index == start_index:
-                    return None 
+                return None
 
                     
     def __delitem__(self , key):
-        index = self.hashKey(key)
-        start_index = index
+        self.pop(key)
+
+    def pop(self, key, default=None):
+        # removes key and returns its value in a single probe sequence
+        entries = self.entries
+        perturb = _mix_hash(key)
+        index = perturb >> self.shift
+        probes = 0
 
         while True:
-            if self.keys[index] == key:
-                # mark as deleted
-                self.keys[index] = HashTable.DELETE
-                self.buckets[index] = None
-                break
+            entry = entries[index]
+            if entry is None:
+                return default # key doesn't exist early exit
 
+            if entry[0] == key:
+                # mark as deleted
+                entries[index] = HashTable.DELETED
+                self._count -= 1
+                self._tombstones += 1
+                self.version += 1
+                # after lots of deletes the tombstones make every probe chain longer
+                # so rebuild at the same size once they take up a quarter of the table
+                if self._tombstones > self.size >> 2:
+                    self._resize(self.size)
+                return entry[1]
+
+            probes += 1
+            if probes <= HashTable.LINEAR_PROBES:
+                index = (index + 1) & self.mask
+            elif probes < self._max_probes:
+                perturb >>= 5
+                index = (index * 5 + 1 + perturb) & self.mask
             else:
-                index = self.hashKey(index + 1)
-
                 # this key doesn't exist
-                if index == start_index:
-                    break
+                return default
 
 
     def __repr__(self):
         output_string = "{"
-        for k, v in zip(self.keys, self.buckets):
+        for entry in self.entries:
+            k, v = entry if entry is not None else (None, None)
             output_string += f'\n\t{k}:  {v}'
         return output_string + "\n}"
 
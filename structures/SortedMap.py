@@ -3,21 +3,37 @@ class SortedMap:
         self.map = {}
         self.sorted_keys = []
         self.sorting_function = sorting_function
+        self._dirty = False # keys were added since the last sort
+        self._sort_keys = {} # key -> sorting_function(key), worked out once per key
 
     def __setitem__(self, key, value):
         # sort regardless of capitalization
+        # the sort waits until items() so loading many keys sorts once
         if key not in self.map:
             self.sorted_keys.append(key)
             if self.sorting_function:
-                self.sorted_keys.sort(key=self.sorting_function)
-            else:
-                self.sorted_keys.sort()
+                self._sort_keys[key] = self.sorting_function(key)
+            self._dirty = True
         self.map[key] = value
 
     def __getitem__(self, key):
         return self.map[key]
 
+    def __delitem__(self, key):
+        # missing keys are ignored
+        if key in self.map:
+            del self.map[key]
+            self.sorted_keys.remove(key)
+            self._sort_keys.pop(key, None)
+
     def items(self):
+        if self._dirty:
+            # stable so keys that compare equal stay in insertion order
+            if self.sorting_function:
+                self.sorted_keys.sort(key=self._sort_keys.__getitem__)
+            else:
+                self.sorted_keys.sort()
+            self._dirty = False
         for key in self.sorted_keys:
             yield (key, self.map[key])
          
\ No newline at end of file